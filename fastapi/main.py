@@ -2,24 +2,31 @@ import logging
 
 from distutils.util import execute
 import time , secrets
+import threading
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, status, Response , Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Generator, List, Optional, Tuple
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime
 import os
+import io
+import codecs
+import csv
 import json
 import base64
 import hashlib
+import anyio
 import mysql.connector
 from mysql.connector import pooling
 from google import genai
 from google.genai import types
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
 from routers import health, devloper, cpu
+from scheduler import Scheduler
 from typing import List, Dict
 
 
@@ -30,8 +37,21 @@ from typing import List, Dict
 
 
 
+# Background scheduler, jobs are registered in the BACKGROUND JOBS section
+scheduler = Scheduler()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler.start()
+    yield
+    # Write out any buffered status before draining the queues
+    scheduler.submit("status_flush")
+    await run_in_threadpool(scheduler.stop)
+
+
 # FastAPI app
-app = FastAPI(root_path="/api")
+app = FastAPI(root_path="/api", lifespan=lifespan)
 
 #HEalth Check Routing
 app.include_router(health.router)
@@ -194,6 +214,55 @@ ORDER BY `rank`.jobRank DESC;
             result = cursor.fetchall()
         return result
 
+    @staticmethod
+    def iter_jobs_queue(fetch_size: int = 1000) -> Generator[Tuple, None, None]:
+        """Yield the column names, then every job row, without loading the whole table."""
+        select_query = """
+SELECT jobs.*, `rank`.jobRank
+FROM jobs
+JOIN `rank` ON jobs.jobid = `rank`.jobid
+ORDER BY `rank`.jobRank DESC;
+
+        """
+        # Not get_db_cursor_wireCutter: the cursor stays open for the whole response and
+        # a client disconnect closes the generator with rows still unread.
+        connection = connection_pool_wireCutter.get_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute(select_query)
+            yield tuple(cursor.column_names)
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            # Discard what was not streamed so the connection goes back to the pool clean
+            if connection.unread_result:
+                connection.consume_results()
+            cursor.close()
+            connection.close()
+
+    @staticmethod
+    def get_top_rank(cursor) -> int:
+        select_query = "SELECT jobRank FROM `rank`  ORDER BY jobRank DESC LIMIT 1"
+        cursor.execute(select_query)
+        result = cursor.fetchone()
+        return result[0] if result else 0
+
+    @staticmethod
+    def insert_jobs(cursor, jobs: List[Tuple]) -> None:
+        """Insert (jobid, jobRank, user, a, b, c, title, description) tuples."""
+        cursor.executemany(
+            "INSERT INTO `rank` (jobid,jobRank) VALUES (%s,%s)",
+            [(job[0], job[1]) for job in jobs]
+        )
+        cursor.executemany(
+            "INSERT INTO jobs (jobid, user, a, b, c, title, description) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            [(job[0],) + tuple(job[2:]) for job in jobs]
+        )
+
 
 
 
@@ -384,6 +453,203 @@ def get_jobs():
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Database error: {str(e)}"
         )
+
+
+# Bulk import/export. Both directions stream so memory stays flat for large job tables.
+IMPORT_CHUNK_SIZE = 500
+EXPORT_FETCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 100
+JOB_IMPORT_FIELDS = ("user", "a", "b", "c", "title", "description")
+BULK_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def bulk_format(fmt: Optional[str], filename: Optional[str] = None) -> str:
+    """Resolve the bulk format from an explicit value or the uploaded file's extension."""
+    fmt = (fmt or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+    if fmt in ("jsonl", "json"):
+        fmt = "ndjson"
+    if fmt not in BULK_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unsupported format, use 'csv' or 'ndjson'"
+        )
+    return fmt
+
+
+def parse_job_int(value, field: str) -> int:
+    """Accept integers and integral strings/floats, reject bools, lists, objects and fractions."""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{field} must be an integer")
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(f"{field} must be an integer")
+        return int(value)
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{field} must be an integer") from None
+
+
+def parse_job_record(record) -> Tuple:
+    if not isinstance(record, dict):
+        raise ValueError("row is not an object")
+    missing = [field for field in JOB_IMPORT_FIELDS if record.get(field) in (None, "")]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    return (
+        str(record["user"]),
+        parse_job_int(record["a"], "a"),
+        parse_job_int(record["b"], "b"),
+        parse_job_int(record["c"], "c"),
+        str(record["title"]),
+        str(record["description"])
+    )
+
+
+def iter_job_records(stream, fmt: str) -> Generator[Tuple, None, None]:
+    """Yield (line, job fields, error) for every row of the upload, reading it incrementally."""
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            try:
+                yield reader.line_num, parse_job_record(record), None
+            except (ValueError, TypeError) as e:
+                yield reader.line_num, None, str(e)
+    else:
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, parse_job_record(json.loads(line)), None
+            except (ValueError, TypeError, RecursionError) as e:
+                yield line_no, None, str(e)
+
+
+def add_import_error(report: Dict, line: Optional[int], error: str) -> None:
+    """Count a failed row, keeping details only for the first MAX_IMPORT_ERRORS."""
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_IMPORT_ERRORS:
+        report["errors"].append({"line": line, "error": error})
+
+
+def flush_job_chunk(chunk: List[Tuple], report: Dict) -> int:
+    """Insert a chunk of (line, jobid, jobRank, fields) in one transaction.
+
+    If the chunk is rejected, its rows are retried one by one so the failing
+    rows can be reported without losing the good ones.
+    """
+    try:
+        with get_db_cursor_wireCutter() as cursor:
+            WireCutter.insert_jobs(cursor, [(jobid, jobRank) + fields for _, jobid, jobRank, fields in chunk])
+        return len(chunk)
+    except (HTTPException, mysql.connector.Error):
+        imported = 0
+        for line, jobid, jobRank, fields in chunk:
+            try:
+                with get_db_cursor_wireCutter() as cursor:
+                    WireCutter.insert_jobs(cursor, [(jobid, jobRank) + fields])
+                imported += 1
+            except HTTPException as e:
+                add_import_error(report, line, e.detail)
+            except mysql.connector.Error as e:
+                add_import_error(report, line, f"Database error: {str(e)}")
+        return imported
+
+
+@app.get("/mcp101/export")
+def export_jobs(format: str = "ndjson"):
+    """Stream every job, in queue order, as CSV or NDJSON."""
+    fmt = bulk_format(format)
+    try:
+        rows = WireCutter.iter_jobs_queue(EXPORT_FETCH_SIZE)
+        # Run the query before the response starts so DB errors still map to a 500.
+        columns = next(rows)
+    except mysql.connector.Error as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {str(e)}"
+        )
+
+    def stream_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        yield buffer.getvalue()
+
+    def stream_ndjson():
+        for row in rows:
+            yield json.dumps(dict(zip(columns, row)), default=str) + "\n"
+
+    async def stream(body):
+        try:
+            async for chunk in iterate_in_threadpool(body):
+                yield chunk
+        finally:
+            # Discard unsent rows in the threadpool, also when the client disconnects,
+            # instead of leaving it to garbage collection on the event loop
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(rows.close)
+
+    return StreamingResponse(
+        stream(stream_csv() if fmt == "csv" else stream_ndjson()),
+        media_type=BULK_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="jobs.{fmt}"'}
+    )
+
+
+@app.post("/mcp101/import")
+def import_jobs(file: UploadFile = File(...), format: Optional[str] = None):
+    """Import jobs from a CSV or NDJSON upload in chunked transactions.
+
+    Imported jobs go above the existing queue in file order, so re-importing
+    an export keeps its order.
+    """
+    fmt = bulk_format(format, file.filename)
+    imported = 0
+    report = {"failed": 0, "errors": []}
+    chunk = []
+    jobid = 0
+    try:
+        # First pass only counts valid rows so the first one can get the highest rank
+        total = sum(1 for _, fields, _ in iter_job_records(file.file, fmt) if fields)
+        file.file.seek(0)
+        with get_db_cursor_wireCutter() as cursor:
+            jobRank = WireCutter.get_top_rank(cursor) + total
+        for line, fields, error in iter_job_records(file.file, fmt):
+            if error:
+                add_import_error(report, line, error)
+                continue
+            # jobids are creation timestamps, keep them unique within the import
+            jobid = max(time.time(), jobid + 0.000001)
+            chunk.append((line, jobid, jobRank, fields))
+            jobRank -= 1
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                imported += flush_job_chunk(chunk, report)
+                chunk = []
+        if chunk:
+            imported += flush_job_chunk(chunk, report)
+    except (UnicodeDecodeError, csv.Error) as e:
+        add_import_error(report, None, f"Could not read file: {str(e)}")
+    # Earlier chunks are already committed, so still report what was written
+    except HTTPException as e:
+        add_import_error(report, None, f"Import stopped: {e.detail}")
+    except mysql.connector.Error as e:
+        add_import_error(report, None, f"Import stopped, database error: {str(e)}")
+
+    return {
+        "status": "Jobs imported" if not report["failed"] else "Jobs imported with errors",
+        "imported": imported,
+        "failed": report["failed"],
+        "errors": report["errors"]
+    }
+
+
 @app.get("/mcp101/{job_id}")
 def get_job(job_id: str):
     """Get a specific job by ID."""
@@ -490,46 +756,49 @@ async def update_job_ranks(jobrank_list: List[JobRankItem]):
         )
 
 
+# Latest device status waiting to be written by the status_flush job
+status_buffer = {}
+status_lock = threading.Lock()
+
+
 class controllerData(BaseModel):
     label: str
     info: str
 
 @app.post("/mcp101/status")
 async def updateStatus(controller_data: List[controllerData]):
+    """Buffer the device status, the status_flush job writes it to the database."""
     timeUp = time.time()
     info_json = json.dumps([item.dict() for item in controller_data])
-    try:
-        with get_db_cursor_wireCutter() as cursor:
-            # Check if there's any entry in the table
-            cursor.execute("SELECT COUNT(*) FROM `statusTable`")
-            count = cursor.fetchone()[0]
-
-            if count == 0:
-                # Insert if no entry
-                insert_query = "INSERT INTO `statusTable` (`time`,`info`) VALUES (%s, %s)"
-                cursor.execute(insert_query, (timeUp, info_json))
-                # cursor.connection.commit()  # Explicitly commit the insertion
-                return {"status": "Info Uploaded successfully (first entry)"}
-            else:
-                # Update the last entry
-                update_query = "UPDATE `statusTable` SET `time` = %s, `info` = %s ORDER BY `time` DESC LIMIT 1"
-                cursor.execute(update_query, (timeUp, info_json))
-                # cursor.connection.commit()  # Explicitly commit the update
-                return {"status": "Last entry updated successfully"}
-    except mysql.connector.Error as e :
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Database error: {str(e)}"
-        )
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"An unexpected error occurred: {str(e)}"
-        )
+    # Keep only the latest report, "since" tracks the oldest unsaved one
+    with status_lock:
+        status_buffer["latest"] = (timeUp, info_json)
+        status_buffer.setdefault("since", timeUp)
+    return {"status": "Info queued successfully"}
+
+
+def write_status(timeUp: float, info_json: str):
+    with get_db_cursor_wireCutter() as cursor:
+        # Check if there's any entry in the table
+        cursor.execute("SELECT COUNT(*) FROM `statusTable`")
+        count = cursor.fetchone()[0]
+
+        if count == 0:
+            # Insert if no entry
+            insert_query = "INSERT INTO `statusTable` (`time`,`info`) VALUES (%s, %s)"
+            cursor.execute(insert_query, (timeUp, info_json))
+        else:
+            # Update the last entry
+            update_query = "UPDATE `statusTable` SET `time` = %s, `info` = %s ORDER BY `time` DESC LIMIT 1"
+            cursor.execute(update_query, (timeUp, info_json))
 
 @app.get("/mcp101/status/last")
 def get_status():
-    """Get all jobs from the database."""
+    """Get the latest device status, including one not yet flushed to the database."""
+    with status_lock:
+        pending = status_buffer.get("latest")
+    if pending:
+        return {"time": int(pending[0]), "data": json.loads(pending[1])}
     try:
         select_query = "SELECT * FROM `statusTable` ORDER BY time DESC LIMIT 1"
         with get_db_cursor_wireCutter() as cursor:
@@ -630,7 +899,7 @@ def getToken(user):
 
 @app.post("/mcp101/register")
 def registeruser(userCredentials:dict):
-    logging.info(userCredentials)
+    scheduler.submit("log_payload", userCredentials)
 
     username=userCredentials["username"]
     password_hash=userCredentials["password_hash"]
@@ -694,3 +963,46 @@ def get_highest_ranked_job():
 # @app.get("/health")
 # def health_check():
 #     return {"status": "healthy", "timestamp": datetime.now()}
+
+
+
+# ----------------------
+# BACKGROUND JOBS
+# ----------------------
+
+STATUS_FLUSH_INTERVAL = 1
+
+
+def flush_status():
+    """Write the buffered device status, keeping it buffered if the write fails."""
+    with status_lock:
+        pending = status_buffer.get("latest")
+    if pending is None:
+        return
+    write_status(*pending)
+    with status_lock:
+        # A newer report may have arrived while writing, leave that one for the next flush
+        if status_buffer.get("latest") is pending:
+            del status_buffer["latest"]
+            del status_buffer["since"]
+        else:
+            status_buffer["since"] = status_buffer["latest"][0]
+
+
+scheduler.register("status_flush", flush_status, maxsize=10)
+scheduler.every("status_flush", STATUS_FLUSH_INTERVAL, when=lambda: "latest" in status_buffer)
+scheduler.register("log_payload", logging.info, retries=0)
+
+
+@app.get("/scheduler")
+def scheduler_stats():
+    """Queue depth, lag and counters for every background job, plus the unsaved device status."""
+    with status_lock:
+        since = status_buffer.get("since")
+    return {
+        "queues": scheduler.stats(),
+        "status_buffer": {
+            "pending": since is not None,
+            "age": round(time.time() - since, 3) if since is not None else 0.0
+        }
+    }
@@ -0,0 +1,169 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """A bounded queue of calls to one handler, worked by a fixed number of threads."""
+
+    def __init__(self, name: str, handler: Callable, concurrency: int = 1, maxsize: int = 1000,
+                 retries: int = 3, backoff: float = 0.5):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.running = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.last_lag = 0.0
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def oldest_lag(self) -> float:
+        """Seconds the item at the head of the queue has been waiting."""
+        with self.queue.mutex:
+            if not self.queue.queue:
+                return 0.0
+            return time.time() - self.queue.queue[0][0]
+
+    def stats(self) -> Dict:
+        return {
+            "depth": self.queue.qsize(),
+            "maxsize": self.queue.maxsize,
+            "lag": round(self.oldest_lag(), 3),
+            "last_lag": round(self.last_lag, 3),
+            "running": self.running,
+            "concurrency": self.concurrency,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+    def run(self, args, kwargs) -> None:
+        for attempt in range(self.retries + 1):
+            try:
+                self.handler(*args, **kwargs)
+                return
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt)
+                logger.warning("Job %s failed (attempt %d), retrying in %.1fs", self.name, attempt + 1, delay)
+                time.sleep(delay)
+
+
+class Scheduler:
+    """In-process scheduler for deferred and periodic work.
+
+    Every job type gets its own bounded queue and worker threads, so a slow
+    job cannot starve the others. Periodic jobs are submitted to their queue
+    on a timer, skipping a tick while the previous one is still queued or
+    running. stop() stops accepting work and drains what is queued.
+    """
+
+    def __init__(self):
+        self.queues: Dict[str, JobQueue] = {}
+        self.periodic: List[tuple] = []
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._started = False
+
+    def register(self, name: str, handler: Callable, concurrency: int = 1, maxsize: int = 1000,
+                 retries: int = 3, backoff: float = 0.5) -> None:
+        self.queues[name] = JobQueue(name, handler, concurrency, maxsize, retries, backoff)
+
+    def every(self, name: str, interval: float, when: Optional[Callable[[], bool]] = None) -> None:
+        """Submit the registered job `name` every `interval` seconds, only if `when()` is true."""
+        self.periodic.append((name, interval, when))
+
+    def submit(self, name: str, *args, **kwargs) -> bool:
+        """Queue a call to job `name`. Returns False if the queue is full or the scheduler is stopping."""
+        job_queue = self.queues[name]
+        try:
+            if self._stopping.is_set():
+                raise queue.Full
+            job_queue.queue.put_nowait((time.time(), args, kwargs))
+            return True
+        except queue.Full:
+            with job_queue._lock:
+                job_queue.rejected += 1
+            logger.warning("Job queue %s rejected a job", name)
+            return False
+
+    def start(self) -> None:
+        if self._started:
+            return
+        self._started = True
+        self._stopping.clear()
+        for job_queue in self.queues.values():
+            for i in range(job_queue.concurrency):
+                self._spawn(f"{job_queue.name}-{i}", self._work, job_queue)
+        for name, interval, when in self.periodic:
+            self._spawn(f"{name}-timer", self._tick, name, interval, when)
+
+    def stop(self, timeout: Optional[float] = 30) -> None:
+        """Stop accepting jobs, finish the queued ones and wait for the workers."""
+        self._stopping.set()
+        deadline = None if timeout is None else time.time() + timeout
+        for thread in self._threads:
+            thread.join(None if deadline is None else max(0, deadline - time.time()))
+        unfinished = [thread.name for thread in self._threads if thread.is_alive()]
+        if unfinished:
+            logger.warning("Scheduler stopped with unfinished workers: %s", ", ".join(unfinished))
+        self._threads = []
+        self._started = False
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: job_queue.stats() for name, job_queue in self.queues.items()}
+
+    def _spawn(self, name: str, target: Callable, *args) -> None:
+        thread = threading.Thread(target=target, args=args, name=f"scheduler-{name}", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _tick(self, name: str, interval: float, when: Optional[Callable[[], bool]]) -> None:
+        job_queue = self.queues[name]
+        while not self._stopping.wait(interval):
+            # Coalesce: a tick is skipped, not rejected, while earlier work is pending
+            if job_queue.queue.qsize() or job_queue.running:
+                continue
+            if when is not None and not when():
+                continue
+            self.submit(name)
+
+    def _work(self, job_queue: JobQueue) -> None:
+        while True:
+            try:
+                enqueued, args, kwargs = job_queue.queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            job_queue.last_lag = time.time() - enqueued
+            with job_queue._lock:
+                job_queue.running += 1
+            try:
+                job_queue.run(args, kwargs)
+                with job_queue._lock:
+                    job_queue.processed += 1
+            except Exception as e:
+                with job_queue._lock:
+                    job_queue.failed += 1
+                    job_queue.last_error = repr(e)
+                    job_queue.last_error_at = time.time()
+                logger.exception("Job %s failed", job_queue.name)
+            finally:
+                with job_queue._lock:
+                    job_queue.running -= 1
+                job_queue.queue.task_done()